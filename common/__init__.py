@@ -0,0 +1 @@
+"""Code shared by the FastAPI backend, the Streamlit app and the data scripts."""
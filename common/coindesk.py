@@ -0,0 +1,43 @@
+from urllib.parse import urljoin
+
+import httpx
+from lxml import etree, html
+
+# -------------------------------
+# 📰 CoinDesk Source
+# -------------------------------
+COINDESK_URL = "https://www.coindesk.com/"
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
+    "Accept-Encoding": "gzip",
+}
+
+
+# -------------------------------
+# 🧾 Headline Parsing
+# -------------------------------
+# Compiled once; each runs as a single libxml2 query
+_HEADLINES = etree.XPath("(//h3)[position() <= $limit]")
+_TITLE = etree.XPath("string()")
+_LINK = etree.XPath("string(ancestor::a[1]/@href)")
+
+
+def parse_headlines(content: bytes, limit: int) -> list:
+    """Return (title, link) pairs for the first `limit` <h3> headlines.
+
+    `link` is absolute, or None when the headline has no enclosing anchor.
+    """
+    tree = html.fromstring(content)
+    headlines = []
+    for h in _HEADLINES(tree, limit=limit):
+        href = _LINK(h)
+        headlines.append((_TITLE(h).strip(), urljoin(COINDESK_URL, href) if href else None))
+    return headlines
+
+
+async def fetch_headlines(client: httpx.AsyncClient, limit: int) -> list:
+    """Download the CoinDesk homepage and parse its headlines."""
+    res = await client.get(COINDESK_URL)
+    res.raise_for_status()
+    return parse_headlines(res.content, limit)
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import httpx
+from aiolimiter import AsyncLimiter
+
+# -------------------------------
+# 🌐 CoinGecko Pro API
+# -------------------------------
+BASE_URL = "https://pro-api.coingecko.com/api/v3"
+TOP_100_PARAMS = {
+    "vs_currency": "usd",
+    "order": "market_cap_desc",
+    "per_page": 100,
+    "page": 1,
+    "sparkline": "false"
+}
+
+# Stay under CoinGecko's per-minute quota instead of eating 429 back-off
+CG_LIMIT = AsyncLimiter(50, 60)
+MAX_ATTEMPTS = 3
+MAX_BACKOFF = 30
+
+
+def cg_headers(api_key: str) -> dict:
+    return {"x-cg-pro-api-key": api_key, "accept": "application/json"}
+
+
+def create_client(api_key: str, timeout: float = 20) -> httpx.AsyncClient:
+    """Pooled HTTP/2 client for CoinGecko, meant to be reused across calls."""
+    return httpx.AsyncClient(base_url=BASE_URL, headers=cg_headers(api_key), http2=True, timeout=timeout)
+
+
+# -------------------------------
+# 🔁 Request Helper
+# -------------------------------
+async def cg_get(client: httpx.AsyncClient, path: str, params: dict) -> httpx.Response:
+    """Rate-limited CoinGecko GET, retried with exponential backoff on 429."""
+    for attempt in range(MAX_ATTEMPTS):
+        async with CG_LIMIT:
+            response = await client.get(path, params=params)
+        if response.status_code != 429 or attempt == MAX_ATTEMPTS - 1:
+            response.raise_for_status()
+            return response
+
+        delay = retry_delay(response, attempt)
+        print(f"⏳ CoinGecko rate limited, retrying {path} in {delay:.0f}s")
+        await asyncio.sleep(delay)
+
+
+def cg_get_sync(client: httpx.Client, path: str, params: dict) -> httpx.Response:
+    """Blocking cg_get for sync callers such as the Streamlit app."""
+    for attempt in range(MAX_ATTEMPTS):
+        response = client.get(path, params=params)
+        if response.status_code != 429 or attempt == MAX_ATTEMPTS - 1:
+            response.raise_for_status()
+            return response
+
+        delay = retry_delay(response, attempt)
+        print(f"⏳ CoinGecko rate limited, retrying {path} in {delay:.0f}s")
+        time.sleep(delay)
+
+
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait after a 429: Retry-After if given, else exponential."""
+    try:
+        delay = float(response.headers.get("retry-after", 2 ** attempt))
+    except ValueError:
+        delay = 2 ** attempt
+    return min(delay, MAX_BACKOFF)
+
+
+# -------------------------------
+# 📈 Endpoints
+# -------------------------------
+async def fetch_gainers_losers(client: httpx.AsyncClient) -> dict:
+    """Top 24h gainers and losers in USD."""
+    response = await cg_get(client, "/coins/top_gainers_losers", {"vs_currency": "usd"})
+    return response.json()
+
+
+async def fetch_markets(client: httpx.AsyncClient) -> list:
+    """Top 100 coins by market cap with full market data."""
+    response = await cg_get(client, "/coins/markets", TOP_100_PARAMS)
+    return response.json()
+
+
+async def fetch_simple_prices(client: httpx.AsyncClient, ids: list) -> dict:
+    """USD price and 24h change for the given coin ids in one request."""
+    params = {"ids": ",".join(ids), "vs_currencies": "usd", "include_24hr_change": "true"}
+    response = await cg_get(client, "/simple/price", params)
+    return response.json()
@@ -0,0 +1,26 @@
+import os
+import tempfile
+from pathlib import Path
+
+import orjson
+
+
+# -------------------------------
+# 💾 Atomic JSON Snapshots
+# -------------------------------
+def write_atomic(path: Path, payload) -> None:
+    """Write payload as JSON to a temp file, then swap it into place.
+
+    Readers see either the old file or the new one, never a partial write.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600; keep snapshots readable like a plain open() would
+        if hasattr(os, "fchmod"):  # not on Windows before 3.13
+            os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps(payload))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -0,0 +1,93 @@
+import re
+from bisect import bisect_right
+
+try:
+    import ahocorasick
+except ImportError:  # fall back to one precompiled regex scan
+    ahocorasick = None
+
+# -------------------------------
+# 🧠 Keyword Lists
+# -------------------------------
+BULLISH_KEYWORDS = [
+    "surge", "rally", "soar", "gain", "bull", "increase", "rise", "positive",
+    "record", "high", "jump", "growth", "breakout", "buy", "invest", "pump"
+]
+BEARISH_KEYWORDS = [
+    "drop", "fall", "crash", "bear", "decline", "loss", "down", "negative",
+    "sell", "dump", "fear", "panic", "collapse", "recession", "dip"
+]
+
+BULLISH = "🟢 Bullish"
+BEARISH = "🔴 Bearish"
+NEUTRAL = "⚪ Neutral"
+
+
+# -------------------------------
+# ⚙️ Keyword Scanner (built once at import)
+# -------------------------------
+_KEYWORDS = {word: (1, word) for word in BULLISH_KEYWORDS}
+_KEYWORDS.update({word: (-1, word) for word in BEARISH_KEYWORDS})
+
+
+def _build_automaton():
+    automaton = ahocorasick.Automaton()
+    for word, value in _KEYWORDS.items():
+        automaton.add_word(word, value)
+    automaton.make_automaton()
+    return automaton
+
+
+if ahocorasick is not None:
+    _scan = _build_automaton().iter
+else:
+    # Lookahead so overlapping keywords are all found, like the automaton.
+    # One match per position: assumes no keyword is a prefix of another.
+    _KEYWORD_RE = re.compile("(?=(" + "|".join(map(re.escape, _KEYWORDS)) + "))")
+
+    def _scan(text: str):
+        """Yield (end_index, (side, word)) like Automaton.iter."""
+        for match in _KEYWORD_RE.finditer(text):
+            word = match.group(1)
+            yield match.start() + len(word) - 1, _KEYWORDS[word]
+
+
+# -------------------------------
+# 📈 Sentiment Classifier
+# -------------------------------
+def _label(score: int) -> str:
+    if score > 0:
+        return BULLISH
+    elif score < 0:
+        return BEARISH
+    return NEUTRAL
+
+
+def classify_sentiment(headline: str) -> str:
+    """Classify a headline as bullish, bearish, or neutral in a single scan.
+
+    Each keyword counts once no matter how often it appears, matching the
+    original ``sum(w in text for w in keywords)`` scoring.
+    """
+    matches = {value for _, value in _scan(headline.lower())}
+    return _label(sum(side for side, _ in matches))
+
+
+def classify_many(headlines) -> list:
+    """Classify a batch of headlines with one keyword scan over the joined text.
+
+    Headlines are joined with ``\\0`` (no keyword spans it) and each match is
+    attributed to its headline by bisecting the start offsets.
+    """
+    lowered = [headline.lower() for headline in headlines]
+    starts = []
+    offset = 0
+    for text in lowered:
+        starts.append(offset)
+        offset += len(text) + 1
+
+    matches = [set() for _ in lowered]
+    for end, value in _scan("\0".join(lowered)):
+        matches[bisect_right(starts, end) - 1].add(value)
+
+    return [_label(sum(side for side, _ in found)) for found in matches]
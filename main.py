@@ -1,21 +1,47 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-import joblib
+from fastapi.responses import ORJSONResponse
+import orjson
 import os
-import requests
-from datetime import datetime, timezone
+from pathlib import Path
+import asyncio
+import httpx
+from cachetools import TTLCache
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
+from common import coindesk, coingecko, jsonfile
+from common.sentiment import classify_many
 from collections import Counter
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import re
+import heapq
 
 # =============================
-# 🚀 Initialize FastAPI App
+# ⚡ Startup & Shutdown
 # =============================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Preload data on startup and release pooled HTTP connections on shutdown"""
+    print("🚀 App startup: Preloading data...")
+    await asyncio.gather(
+        once("gainers-losers", fetch_and_save_gainers_losers),
+        once("coindesk", fetch_and_save_coindesk_news),
+    )
+    yield
+    await CLIENT.aclose()
+    await CG.aclose()
+
+
 # =============================
 # 🚀 Initialize FastAPI App
 # =============================
-app = FastAPI(title="Crypto News & Market API", version="2.1")
+app = FastAPI(
+    title="Crypto News & Market API",
+    version="2.1",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # Enable CORS for Vercel + Localhost
 app.add_middleware(
@@ -34,8 +60,10 @@ app.add_middleware(
 # =============================
 # 📁 Database Path
 # =============================
-DB_DIR = "/data" if os.path.exists("/data") else "database"
-os.makedirs(DB_DIR, exist_ok=True)
+DB_DIR = Path("/data") if os.path.exists("/data") else Path("database")
+DB_DIR.mkdir(parents=True, exist_ok=True)
+GAINERS_PATH = DB_DIR / "top_gainers_losers.json"
+COINDESK_PATH = DB_DIR / "coindesk_news.json"
 
 # =============================
 # 🔑 Load CoinGecko API Key
@@ -45,91 +73,148 @@ API_KEY = os.getenv("COINGECKO_API_KEY")
 if not API_KEY:
     raise ValueError("🚨 Missing COINGECKO_API_KEY in .env file!")
 
+# =============================
+# 🌐 Shared HTTP Clients
+# =============================
+CLIENT = httpx.AsyncClient(http2=True, timeout=20, headers=coindesk.BROWSER_HEADERS, follow_redirects=True)
+
+# Pooled HTTP/2 connection to CoinGecko, reused across requests
+CG = coingecko.create_client(API_KEY)
+
+# =============================
+# 🧠 In-Memory Caches
+# =============================
+# CoinGecko market prices tick roughly once a minute
+TOP100_TTL = 60
+_TOP100 = TTLCache(maxsize=1, ttl=TOP100_TTL)
+# Top 100 membership (ids, names, ranks) moves far slower than prices
+TOP100_IDS_TTL = 3600
+_TOP100_IDS = TTLCache(maxsize=1, ttl=TOP100_IDS_TTL)
+_top100_stale = None
+
+# Saved payloads older than this are served stale while a refresh runs
+DATA_TTL_MINUTES = 15
+
+# Latest gainers/losers payload, replaced whenever it is re-fetched
+_gainers_losers = None
+
+# Latest CoinDesk payload and its /coindesk bodies, pre-encoded once per
+# refresh for both the fresh and the stale response
+_coindesk = None
+_coindesk_json = None
+_coindesk_stale_json = None
+
+# Fetches currently running, keyed by data source (see `once`)
+_inflight = {}
+
 # =============================
 # ⚙️ Helper Functions
 # =============================
 
-def load_joblib(file_name: str):
-    """Safely load joblib file"""
-    file_path = os.path.join(DB_DIR, file_name)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail=f"File not found: {file_name}")
+def load_json(path: Path):
+    """Safely load saved JSON file"""
     try:
-        return joblib.load(file_path)
+        return orjson.loads(path.read_bytes())
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"File not found: {path.name}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def classify_sentiment(headline: str) -> str:
-    """Simple keyword-based sentiment classifier for headlines"""
-    bullish = ["surge","rally","soar","gain","bull","increase","rise","positive","record","high","jump","growth","breakout","buy","invest","pump"]
-    bearish = ["drop","fall","crash","bear","decline","loss","down","negative","sell","dump","fear","panic","collapse","recession","dip"]
-    text = headline.lower()
-    bull_score = sum(w in text for w in bullish)
-    bear_score = sum(w in text for w in bearish)
-    if bull_score > bear_score:
-        return "🟢 Bullish"
-    elif bear_score > bull_score:
-        return "🔴 Bearish"
-    return "⚪ Neutral"
+def save_json(path: Path, payload):
+    """Write payload to path as JSON, atomically"""
+    jsonfile.write_atomic(path, payload)
+
+
+def is_expired(payload) -> bool:
+    """True once a saved payload is older than its ttl_minutes"""
+    try:
+        saved = datetime.fromisoformat(payload["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return True
+    ttl = timedelta(minutes=payload.get("ttl_minutes", DATA_TTL_MINUTES))
+    return datetime.now(timezone.utc) - saved > ttl
+
+
+def set_coindesk(payload):
+    """Keep the CoinDesk payload in memory with its encoded response bodies"""
+    global _coindesk, _coindesk_json, _coindesk_stale_json
+    _coindesk = payload
+    _coindesk_json = orjson.dumps({**payload, "stale": False})
+    _coindesk_stale_json = orjson.dumps({**payload, "stale": True})
+
 
+_SENT_SPLIT = re.compile(r'(?<=[.!?]) +')
+_WORD = re.compile(r'\w+')
 
+
+@lru_cache(maxsize=512)
 def summarize_text(text: str, max_sentences: int = 2) -> str:
     """Lightweight keyword-based text summarizer"""
-    sentences = re.split(r'(?<=[.!?]) +', text)
+    # Headlines are usually one sentence: skip the split/rank when there
+    # are too few terminators for the text to exceed max_sentences.
+    if sum(text.count(p) for p in ".!?") < max_sentences:
+        return text
+
+    sentences = _SENT_SPLIT.split(text)
     if len(sentences) <= max_sentences:
         return text
 
-    words = re.findall(r'\w+', text.lower())
-    freq = Counter(words)
-    ranked = sorted(sentences, key=lambda s: sum(freq[w.lower()] for w in re.findall(r'\w+', s)), reverse=True)
-    summary = " ".join(ranked[:max_sentences])
+    # Tokenize every sentence once and reuse it for both counting and scoring
+    sent_words = [_WORD.findall(s.lower()) for s in sentences]
+    freq = Counter(w for words in sent_words for w in words)
+    scores = [sum(freq[w] for w in words) for words in sent_words]
+    top = heapq.nlargest(max_sentences, range(len(sentences)), key=scores.__getitem__)
+    summary = " ".join(sentences[i] for i in top)
     return summary.strip()
 
 
+def start_once(key: str, coro_fn) -> asyncio.Task:
+    """Start coro_fn unless a fetch for the same key is already running"""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(coro_fn())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return task
+
+
+async def once(key: str, coro_fn):
+    """Single-flight: concurrent callers for the same key share one running fetch"""
+    # Shield so one caller disconnecting does not cancel the fetch for the rest
+    return await asyncio.shield(start_once(key, coro_fn))
+
+
 # =============================
 # 🌍 Fetch Functions
 # =============================
 
-def fetch_and_save_gainers_losers():
+async def fetch_and_save_gainers_losers():
     """Fetch top gainers & losers from CoinGecko and save locally"""
-    url = "https://pro-api.coingecko.com/api/v3/coins/top_gainers_losers"
-    headers = {"x-cg-pro-api-key": API_KEY, "accept": "application/json"}
-    params = {"vs_currency": "usd"}
-
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=20)
-        response.raise_for_status()
-        data = response.json()
+        data = await coingecko.fetch_gainers_losers(CG)
         payload = {
             "timestamp": datetime.now(timezone.utc).isoformat(),
+            "ttl_minutes": DATA_TTL_MINUTES,
             "data": data
         }
-        joblib.dump(payload, os.path.join(DB_DIR, "top_gainers_losers.joblib"))
+        save_json(GAINERS_PATH, payload)
+        global _gainers_losers
+        _gainers_losers = payload
         print("✅ Gainers/Losers data updated.")
     except Exception as e:
         print(f"⚠️ Error fetching CoinGecko data: {e}")
 
 
-def fetch_and_save_coindesk_news(limit: int = 30):
+async def fetch_and_save_coindesk_news(limit: int = 30):
     """Fetch CoinDesk news and save locally with summaries"""
-    url = "https://www.coindesk.com/"
-    headers = {"User-Agent": "Mozilla/5.0"}
-
     try:
-        res = requests.get(url, headers=headers, timeout=20)
-        res.raise_for_status()
-        soup = BeautifulSoup(res.text, "html.parser")
-        headlines = soup.find_all("h3")
+        headlines = await coindesk.fetch_headlines(CLIENT, limit)
 
-        articles = []
-        for h in headlines[:limit]:
-            title = h.text.strip()
-            parent_link = h.find_parent("a")
-            href = parent_link["href"] if parent_link and parent_link.get("href") else None
-            full_link = url + href if href and href.startswith("/") else href
+        sentiments = classify_many(title for title, _ in headlines)
 
-            sentiment = classify_sentiment(title)
+        articles = []
+        for (title, full_link), sentiment in zip(headlines, sentiments):
             summary = summarize_text(title)
 
             articles.append({
@@ -141,11 +226,13 @@ def fetch_and_save_coindesk_news(limit: int = 30):
 
         payload = {
             "timestamp": datetime.now(timezone.utc).isoformat(),
+            "ttl_minutes": DATA_TTL_MINUTES,
             "source": "CoinDesk",
             "articles": articles
         }
 
-        joblib.dump(payload, os.path.join(DB_DIR, "coindesk_news.joblib"))
+        save_json(COINDESK_PATH, payload)
+        set_coindesk(payload)
         print("✅ CoinDesk news updated.")
     except Exception as e:
         print(f"⚠️ Error fetching CoinDesk news: {e}")
@@ -163,10 +250,24 @@ def home():
 # 📈 Top Gainers & Losers (Saved)
 # =============================
 @app.get("/gainers-losers")
-def get_gainers_losers():
-    data = load_joblib("top_gainers_losers.joblib")
+async def get_gainers_losers(response: Response):
+    global _gainers_losers
+    if _gainers_losers is not None:
+        response.headers["X-Cache"] = "HIT"
+    else:
+        _gainers_losers = load_json(GAINERS_PATH)
+        response.headers["X-Cache"] = "MISS"
+    data = _gainers_losers
+
+    # Past its TTL: answer with what we have and refresh in the background
+    stale = is_expired(data)
+    if stale:
+        start_once("gainers-losers", fetch_and_save_gainers_losers)
+        response.headers["X-Cache"] = "STALE"
+
     return {
         "timestamp": data.get("timestamp"),
+        "stale": stale,
         "top_gainers": data["data"].get("top_gainers", []),
         "top_losers": data["data"].get("top_losers", []),
     }
@@ -175,74 +276,117 @@ def get_gainers_losers():
 # =============================
 # 🪙 Top 100 Live Prices
 # =============================
-@app.get("/top-100")
-def get_top_100():
-    """Fetch live top 100 crypto prices from CoinGecko"""
-    url = "https://pro-api.coingecko.com/api/v3/coins/markets"
-    headers = {"x-cg-pro-api-key": API_KEY, "accept": "application/json"}
-    params = {
-        "vs_currency": "usd",
-        "order": "market_cap_desc",
-        "per_page": 100,
-        "page": 1,
-        "sparkline": "false"
-    }
-
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=20)
-        response.raise_for_status()
-        coins = response.json()
-        return [
+async def fetch_top_100():
+    """Fetch live top 100 crypto prices from CoinGecko and cache them
+
+    The full /coins/markets listing is only pulled once an hour to learn
+    which coins are in the top 100; in between, prices come from the much
+    smaller /simple/price payload for those ids.
+    """
+    global _top100_stale
+    coins = _TOP100_IDS.get("coins")
+
+    if coins is None:
+        markets = await coingecko.fetch_markets(CG)
+        coins = [
             {
+                "id": c.get("id"),
                 "name": c.get("name"),
                 "symbol": c.get("symbol", "").upper(),
-                "price": c.get("current_price"),
-                "change_24h": c.get("price_change_percentage_24h"),
                 "market_cap_rank": c.get("market_cap_rank")
             }
-            for c in coins
+            for c in markets
         ]
+        _TOP100_IDS["coins"] = coins
+        prices = {
+            c.get("id"): {"usd": c.get("current_price"), "usd_24h_change": c.get("price_change_percentage_24h")}
+            for c in markets
+        }
+    else:
+        prices = await coingecko.fetch_simple_prices(CG, [c["id"] for c in coins])
+
+    data = [
+        {
+            "name": c["name"],
+            "symbol": c["symbol"],
+            "price": prices.get(c["id"], {}).get("usd"),
+            "change_24h": prices.get(c["id"], {}).get("usd_24h_change"),
+            "market_cap_rank": c["market_cap_rank"]
+        }
+        for c in coins
+    ]
+    _TOP100["top100"] = _top100_stale = data
+    return data
+
+
+async def revalidate_top_100():
+    """Background refresh used while a stale top 100 is being served"""
+    try:
+        return await fetch_top_100()
+    except Exception as e:
+        print(f"⚠️ Error refreshing top 100 prices: {e}")
+
+
+@app.get("/top-100")
+async def get_top_100(response: Response):
+    """Serve top 100 prices from cache, refreshing from CoinGecko once per TTL"""
+    cached = _TOP100.get("top100")
+    if cached is not None:
+        response.headers["X-Cache"] = "HIT"
+        return cached
+
+    # Expired: answer with the last known prices and revalidate off the request path
+    if _top100_stale is not None:
+        start_once("top-100", revalidate_top_100)
+        response.headers["X-Cache"] = "STALE"
+        return _top100_stale
+
+    try:
+        data = await once("top-100", fetch_top_100)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching live data: {e}")
+    response.headers["X-Cache"] = "MISS"
+    return data
 
 
 # =============================
 # 📰 CoinDesk Headlines (Saved)
 # =============================
 @app.get("/coindesk")
-def get_coindesk_news():
+async def get_coindesk_news():
     """Return latest CoinDesk headlines with summaries"""
-    path = os.path.join(DB_DIR, "coindesk_news.joblib")
-    if not os.path.exists(path):
-        fetch_and_save_coindesk_news()
+    if _coindesk is None:
+        if not COINDESK_PATH.is_file():
+            await once("coindesk", fetch_and_save_coindesk_news)
 
-    data = joblib.load(path)
+    # Not scraped in this process yet: fall back to the saved file once
+    if _coindesk is None:
+        data = load_json(COINDESK_PATH)
 
-    # Add summaries if missing (for older files)
-    for article in data.get("articles", []):
-        if "summary" not in article or not article["summary"]:
-            article["summary"] = summarize_text(article.get("title", ""))
+        # Add summaries if missing (for older files)
+        for article in data.get("articles", []):
+            if "summary" not in article or not article["summary"]:
+                article["summary"] = summarize_text(article.get("title", ""))
 
-    return data
+        set_coindesk(data)
+
+    # Past its TTL: answer with what we have and refresh in the background
+    if is_expired(_coindesk):
+        start_once("coindesk", fetch_and_save_coindesk_news)
+        return Response(content=_coindesk_stale_json, media_type="application/json")
+
+    return Response(content=_coindesk_json, media_type="application/json")
 
 
 # =============================
 # 🔄 Refresh Endpoint
 # =============================
 @app.get("/refresh")
-def refresh_data():
+async def refresh_data():
     """Manually refresh and save new data for CoinGecko + CoinDesk"""
-    fetch_and_save_gainers_losers()
-    fetch_and_save_coindesk_news()
+    await asyncio.gather(
+        once("gainers-losers", fetch_and_save_gainers_losers),
+        once("coindesk", fetch_and_save_coindesk_news),
+    )
     return {"message": "✅ Data refreshed successfully!"}
 
-
-# =============================
-# ⚡ Run on Startup
-# =============================
-@app.on_event("startup")
-def preload_data():
-    """Ensure data files exist when app starts"""
-    print("🚀 App startup: Preloading data...")
-    fetch_and_save_gainers_losers()
-    fetch_and_save_coindesk_news()
@@ -1,176 +1,290 @@
 import os
+import threading
 import time
-import joblib
-import requests
+import httpx
+import orjson
+import pandas as pd
 import streamlit as st
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
 from dotenv import load_dotenv
+from lxml import etree
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from common import coindesk, coingecko, jsonfile
+from common.sentiment import classify_many
+
+try:
+    import redis
+except ImportError:  # shared cache is optional; st.cache_data still applies
+    redis = None
 
 # =======================================
 # 🔐 Load API Key
 # =======================================
-load_dotenv()
-API_KEY = os.getenv("COINGECKO_API_KEY")
+@st.cache_resource(show_spinner=False)
+def _cfg():
+    """Read .env once per process; Streamlit re-executes this script on every rerun."""
+    load_dotenv()
+    return SimpleNamespace(CG_KEY=os.getenv("COINGECKO_API_KEY"), REDIS_URL=os.getenv("REDIS_URL"))
+
+
+API_KEY = _cfg().CG_KEY
+REDIS_URL = _cfg().REDIS_URL
 
 # =======================================
-# 📰 Scrape Crypto News from CoinDesk
+# 🧰 Shared Cache (Redis, optional)
 # =======================================
+NEWS_KEY = "coindesk:news"
+GAINERS_KEY = "coingecko:gainers_losers"
+REDIS_TIMEOUT = 0.5  # seconds
+
 
-NEWS_CACHE_FILE = "coindesk_news.joblib"
-GAINERS_CACHE_FILE = "top_gainers_losers.joblib"
-
-def fetch_and_cache_coindesk_news(limit=20):
-    """Scrape latest crypto news headlines from CoinDesk and cache results."""
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/118.0.0.0 Safari/537.36")
-    
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    driver.get("https://www.coindesk.com/")
-    
+@st.cache_resource
+def get_redis():
+    """Redis connection shared by all sessions, or None when not configured."""
+    if redis is None or not REDIS_URL:
+        return None
+    # Short timeouts so an unreachable Redis degrades to a miss, not a hung page
+    return redis.Redis.from_url(
+        REDIS_URL,
+        decode_responses=False,
+        socket_connect_timeout=REDIS_TIMEOUT,
+        socket_timeout=REDIS_TIMEOUT,
+    )
+
+
+def shared_get(r, key):
+    """Cached value for key from Redis `r`; None on a miss or when Redis is down."""
+    if r is None:
+        return None
     try:
-        WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.TAG_NAME, "h3")))
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        headlines = soup.find_all("h3")
-    finally:
-        driver.quit()
-    
-    articles = []
-    for headline in headlines[:limit]:
-        title = headline.text.strip()
-        link = headline.find_parent("a")
-        href = link["href"] if link and link.get("href") else None
-        if href:
-            full_link = href if href.startswith("http") else f"https://www.coindesk.com{href}"
-            articles.append({"title": title, "link": full_link})
-    
-    joblib.dump(articles, NEWS_CACHE_FILE)
-    return articles
+        value = r.get(key)
+    except redis.RedisError:
+        return None
+    return orjson.loads(value) if value else None
 
-    def classify_sentiment(headline: str) -> str:
-        """Classify crypto news headline as bullish, bearish, or neutral."""
-        bullish_keywords = [
-            "surge", "rally", "soar", "gain", "bull", "increase", "rise", "positive",
-            "record", "high", "jump", "growth", "breakout", "buy", "invest", "pump"
-        ]
-        bearish_keywords = [
-            "drop", "fall", "crash", "bear", "decline", "loss", "down", "negative",
-            "sell", "dump", "fear", "panic", "collapse", "recession", "dip"
-        ]
-        text = headline.lower()
-        bull_score = sum(1 for word in bullish_keywords if word in text)
-        bear_score = sum(1 for word in bearish_keywords if word in text)
-        if bull_score > bear_score:
-            return "🟢 Bullish"
-        elif bear_score > bull_score:
-            return "🔴 Bearish"
-        else:
-            return "⚪ Neutral"
-
-    def fetch_and_cache_coindesk_news(limit=10):
-        """Scrape latest crypto news headlines from CoinDesk, classify sentiment, and cache to joblib file."""
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0.4472.124")
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-        news_url = "https://www.coindesk.com/"
-        driver.get(news_url)
-        try:
-            WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.TAG_NAME, "h3")))
-            soup = BeautifulSoup(driver.page_source, "html.parser")
-            headlines = soup.find_all("h3")
-        finally:
-            driver.quit()
-        articles = []
-        for headline in headlines[:limit]:
-            title = headline.text.strip()
-            link = headline.find_parent("a")
-            href = link["href"] if link and link.get("href") else None
-            if href:
-                full_link = href if href.startswith("http") else f"https://www.coindesk.com{href}"
-                sentiment = classify_sentiment(title)
-                articles.append({"title": title, "link": full_link, "sentiment": sentiment})
-        joblib.dump(articles, NEWS_CACHE_FILE)
+
+def shared_set(r, key, value, ttl):
+    if r is None:
+        return
+    try:
+        r.set(key, orjson.dumps(value), ex=ttl)
+    except redis.RedisError:
+        pass
+
+
+def shared_delete(r, key):
+    if r is None:
+        return
+    try:
+        r.delete(key)
+    except redis.RedisError:
+        pass
+
+# =======================================
+# 📰 Scrape Crypto News from CoinDesk
+# =======================================
+
+GAINERS_CACHE_FILE = Path("top_gainers_losers.json")
+
+NEWS_TTL = timedelta(minutes=10)
+GAINERS_SHARED_TTL = 300  # seconds
+MARKET_TTL = 600  # seconds before a CoinGecko result is refreshed in the background
+
+# Network failures, non-JSON responses and unparseable pages
+FETCH_ERRORS = (httpx.HTTPError, ValueError, etree.ParserError)
+
+
+@st.cache_resource
+def get_http_client():
+    """One pooled HTTP client shared by every session and rerun."""
+    return httpx.Client(http2=True, timeout=15, headers=coindesk.BROWSER_HEADERS, follow_redirects=True)
+
+
+@st.cache_resource
+def get_cg_client():
+    """Keep-alive HTTP/2 client for CoinGecko, shared like get_http_client."""
+    return httpx.Client(
+        base_url=coingecko.BASE_URL,
+        http2=True,
+        timeout=15,
+        headers={**coingecko.cg_headers(API_KEY), "Accept-Encoding": "gzip"},
+        limits=httpx.Limits(max_keepalive_connections=4),
+    )
+
+
+@st.cache_data(ttl=NEWS_TTL, show_spinner=False)
+def fetch_coindesk_news(limit=20):
+    """Scrape latest crypto news headlines from CoinDesk and classify sentiment.
+
+    Cached for NEWS_TTL, so every session inside the window shares one scrape;
+    with Redis configured, every app process shares it too.
+    """
+    r = get_redis()
+    articles = shared_get(r, NEWS_KEY)
+    if articles is not None:
         return articles
 
+    res = get_http_client().get(coindesk.COINDESK_URL)
+    res.raise_for_status()
+    headlines = [(title, link) for title, link in coindesk.parse_headlines(res.content, limit) if link]
+    sentiments = classify_many(title for title, _ in headlines)
+    articles = [
+        {"title": title, "link": link, "sentiment": sentiment}
+        for (title, link), sentiment in zip(headlines, sentiments)
+    ]
+    shared_set(r, NEWS_KEY, articles, int(NEWS_TTL.total_seconds()))
+    return articles
 
-def load_coindesk_news():
-    """Load cached news from disk."""
-    if os.path.exists(NEWS_CACHE_FILE):
-        try:
-            return joblib.load(NEWS_CACHE_FILE)
-        except Exception:
-            return []
-    return []
 
 def load_top_gainers_losers():
     """Load cached top gainers/losers from disk."""
-    if os.path.exists(GAINERS_CACHE_FILE):
-        try:
-            return joblib.load(GAINERS_CACHE_FILE)
-        except Exception:
-            return None
-    return None
+    try:
+        return orjson.loads(GAINERS_CACHE_FILE.read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+
+# =======================================
+# ♻️ Stale-While-Revalidate
+# =======================================
+@st.cache_resource
+def _swr_store():
+    """Process-wide {key: (value, fetched_at)} plus the keys being refreshed."""
+    return {"lock": threading.Lock(), "entries": {}, "refreshing": set()}
+
+
+def _refresh(store, key, fetch):
+    # Runs on a bare thread, so it must not touch st.*; callers resolve the
+    # store and the clients `fetch` needs beforehand.
+    try:
+        value = fetch()
+        with store["lock"]:
+            store["entries"][key] = (value, time.monotonic())
+    except FETCH_ERRORS as e:
+        print(f"⚠️ Background refresh of {key} failed, keeping stale data: {e}")
+    finally:
+        with store["lock"]:
+            store["refreshing"].discard(key)
+
+
+def stale_while_revalidate(key, fetch, ttl=MARKET_TTL):
+    """Return the cached value for key, refreshing it in a thread once stale.
+
+    Only the very first call blocks on `fetch`; after that an expired value
+    is served immediately while one background thread replaces it.
+    """
+    store = _swr_store()
+    with store["lock"]:
+        entry = store["entries"].get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            if time.monotonic() - fetched_at > ttl and key not in store["refreshing"]:
+                store["refreshing"].add(key)
+                threading.Thread(target=_refresh, args=(store, key, fetch), daemon=True).start()
+            return value
+
+    value = fetch()
+    with store["lock"]:
+        store["entries"][key] = (value, time.monotonic())
+    return value
 
 
 # =======================================
 # 📊 Fetch Top Gainers/Losers from CoinGecko
 # =======================================
-@st.cache_data(ttl=600)
 def get_top_gainers_losers():
-    if not API_KEY:
-        st.warning("⚠️ Missing CoinGecko API key. Add it to your .env file.")
-        return None
+    client, r = get_cg_client(), get_redis()
+    return stale_while_revalidate("gainers_losers", lambda: _fetch_top_gainers_losers(client, r))
 
-    url = "https://pro-api.coingecko.com/api/v3/coins/top_gainers_losers"
-    headers = {"x-cg-pro-api-key": API_KEY, "accept": "application/json"}
-    params = {"vs_currency": "usd"}
 
+def _fetch_top_gainers_losers(client, r):
+    data = shared_get(r, GAINERS_KEY)
+    if data is not None:
+        return data
+
+    response = coingecko.cg_get_sync(client, "/coins/top_gainers_losers", {"vs_currency": "usd"})
+    data = response.json()
+    shared_set(r, GAINERS_KEY, data, GAINERS_SHARED_TTL)
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=15)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error fetching CoinGecko data: {e}")
-        return None
+        jsonfile.write_atomic(GAINERS_CACHE_FILE, data)
+    except OSError as e:  # read-only or full disk; the fallback snapshot is optional
+        print(f"⚠️ Could not write {GAINERS_CACHE_FILE}: {e}")
+    return data
 
 
 # =======================================
 # 💹 Fetch Top 100 Crypto Prices
 # =======================================
-@st.cache_data(ttl=600)
 def get_top_100_prices():
-    if not API_KEY:
-        st.warning("⚠️ Missing CoinGecko API key. Add it to your .env file.")
-        return []
-
-    url = "https://pro-api.coingecko.com/api/v3/coins/markets"
-    headers = {"x-cg-pro-api-key": API_KEY, "accept": "application/json"}
-    params = {
-        "vs_currency": "usd",
-        "order": "market_cap_desc",
-        "per_page": 100,
-        "page": 1,
-        "sparkline": "false"
-    }
+    client = get_cg_client()
+    return stale_while_revalidate("top100", lambda: _fetch_top_100_prices(client))
 
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=15)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error fetching top 100 prices: {e}")
-        return []
+
+def _fetch_top_100_prices(client):
+    response = coingecko.cg_get_sync(client, "/coins/markets", coingecko.TOP_100_PARAMS)
+    return response.json()
+
+
+# =======================================
+# ⚡ Fetch Everything Concurrently
+# =======================================
+def load_page_data(news_limit=20):
+    """Run the independent news and CoinGecko fetches in parallel threads.
+
+    Returns `(results, errors)` keyed by "news", "gainers_losers" and
+    "top100"; a failed fetch is missing from `results` and listed in `errors`.
+    """
+    jobs = {"news": lambda: fetch_coindesk_news(news_limit)}
+    if API_KEY:
+        jobs["gainers_losers"] = get_top_gainers_losers
+        jobs["top100"] = get_top_100_prices
+
+    # Workers share this run's context so the cached getters know their session
+    ctx = get_script_run_ctx()
+
+    def attach():
+        add_script_run_ctx(threading.current_thread(), ctx)
+
+    with ThreadPoolExecutor(max_workers=len(jobs), initializer=attach) as pool:
+        futures = {name: pool.submit(job) for name, job in jobs.items()}
+
+    results, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except FETCH_ERRORS as e:
+            errors[name] = e
+    return results, errors
+
+
+# =======================================
+# 📋 Table Layouts
+# =======================================
+MOVERS_COLUMNS = {
+    "name": "Coin",
+    "symbol": "Symbol",
+    "market_cap_rank": st.column_config.NumberColumn("🏅 Rank"),
+    "usd": st.column_config.NumberColumn("💵 Price", format="$%.2f"),
+    "usd_24h_change": st.column_config.NumberColumn("24h", format="%.2f%%"),
+    "usd_24h_vol": st.column_config.NumberColumn("📊 Vol", format="$%d"),
+}
+TOP100_COLUMNS = {
+    "name": "Coin",
+    "symbol": "Symbol",
+    "current_price": st.column_config.NumberColumn("Price", format="$%.2f"),
+    "market_cap": st.column_config.NumberColumn("Market Cap", format="$%d"),
+    "price_change_percentage_24h": st.column_config.NumberColumn("24h", format="%.2f%%"),
+}
+
+
+def movers_frame(coins):
+    """One gainers/losers table instead of a block of widgets per coin."""
+    df = pd.DataFrame(coins, columns=MOVERS_COLUMNS.keys())
+    df["symbol"] = df["symbol"].str.upper()
+    return df
 
 
 # =======================================
@@ -181,86 +295,73 @@ st.set_page_config(page_title="Crypto News Blog", page_icon="🪙", layout="wide
 st.title("🪙 Crypto News & Market Movers")
 st.caption("Live crypto headlines and market data powered by CoinDesk & CoinGecko")
 
+refresh = st.button("🔄 Refresh CoinDesk News", help="Fetch the latest crypto headlines")
+
+if refresh:
+    shared_delete(get_redis(), NEWS_KEY)
+    fetch_coindesk_news.clear()
+
+if not API_KEY:
+    st.warning("⚠️ Missing CoinGecko API key. Add it to your .env file.")
+
+with st.spinner("Fetching latest crypto news and prices..."):
+    data, errors = load_page_data(news_limit=20)
+
 # Sidebar: Market Movers
 st.sidebar.header("📈 Market Movers")
 
+if "gainers_losers" in errors:
+    st.sidebar.error(f"Error fetching CoinGecko data: {errors['gainers_losers']}")
 
-market_data = load_top_gainers_losers()
+market_data = data.get("gainers_losers") or load_top_gainers_losers()
 if not market_data:
     st.sidebar.warning("No market data available in cache.")
 else:
     gainers = market_data.get("top_gainers", [])[:10]
     losers = market_data.get("top_losers", [])[:10]
 
-    col1, col2 = st.sidebar.columns(2)
-
-    # ---- Column 1: Top Gainers ----
-    with col1:
-        st.subheader("🟢 Gainers")
-        for coin in gainers:
-            name = coin.get("name", "Unknown")
-            symbol = coin.get("symbol", "").upper()
-            rank = coin.get("market_cap_rank", "N/A")
-            price = coin.get("usd", 0)
-            change = coin.get("usd_24h_change", 0)
-            volume = coin.get("usd_24h_vol", 0)
-            st.markdown(f"**{name} ({symbol})**")
-            st.caption(f"🏅 Rank: {rank}")
-            st.metric("💵 Price", f"${price:,.2f}", f"{change:.2f}%")
-            st.caption(f"📊 Vol: ${volume:,.0f}")
-            st.markdown("---")
-
-    # ---- Column 2: Top Losers ----
-    with col2:
-        st.subheader("🔴 Losers")
-        for coin in losers:
-            name = coin.get("name", "Unknown")
-            symbol = coin.get("symbol", "").upper()
-            rank = coin.get("market_cap_rank", "N/A")
-            price = coin.get("usd", 0)
-            change = coin.get("usd_24h_change", 0)
-            volume = coin.get("usd_24h_vol", 0)
-            st.markdown(f"**{name} ({symbol})**")
-            st.caption(f"🏅 Rank: {rank}")
-            st.metric("💵 Price", f"${price:,.2f}", f"{change:.2f}%")
-            st.caption(f"📊 Vol: ${volume:,.0f}")
-            st.markdown("---")
+    # ---- Top Gainers ----
+    st.sidebar.subheader("🟢 Gainers")
+    st.sidebar.dataframe(movers_frame(gainers), column_config=MOVERS_COLUMNS, hide_index=True)
+
+    # ---- Top Losers ----
+    st.sidebar.subheader("🔴 Losers")
+    st.sidebar.dataframe(movers_frame(losers), column_config=MOVERS_COLUMNS, hide_index=True)
 
 
 # =======================================
 # 📰 Main Section: News
 # =======================================
-refresh = st.button("🔄 Refresh CoinDesk News", help="Fetch the latest crypto headlines")
-
-if refresh:
-    with st.spinner("Fetching latest crypto news..."):
-        news = fetch_and_cache_coindesk_news(limit=20)
-else:
-    news = load_coindesk_news()
-
 st.markdown("## 🗞 Latest Crypto News")
+if "news" in errors:
+    st.error(f"Error fetching CoinDesk news: {errors['news']}")
+
+news = data.get("news", [])
 if not news:
-    st.info("No crypto news found. Click 'Refresh CoinDesk News' to fetch.")
+    st.info("No crypto news found. Click 'Refresh CoinDesk News' to try again.")
 else:
-    for item in news:
-            st.subheader(item["title"])
-            st.write(f"Sentiment: {item.get('sentiment', 'N/A')}")
-            st.markdown(f"[Read full article →]({item['link']})")
-            st.markdown("---")
+    st.markdown("\n\n---\n\n".join(
+        f"### {item['title']}\n\n"
+        f"Sentiment: {item.get('sentiment', 'N/A')}\n\n"
+        f"[Read full article →]({item['link']})"
+        for item in news
+    ))
 
 
 # =======================================
 # 💰 Top 100 Prices
 # =======================================
 st.markdown("## 💰 Top 100 Crypto Prices (USD)")
-top100 = get_top_100_prices()
+if "top100" in errors:
+    st.error(f"Error fetching top 100 prices: {errors['top100']}")
+
+top100 = data.get("top100", [])
 
 if not top100:
     st.info("No price data available.")
 else:
-    for coin in top100:
-        name = coin.get("name", "Unknown")
-        price = coin.get("current_price", "N/A")
-        st.write(f"**{name}** — ${price:,.2f}")
+    df = pd.DataFrame(top100, columns=TOP100_COLUMNS.keys())
+    df["symbol"] = df["symbol"].str.upper()
+    st.dataframe(df, column_config=TOP100_COLUMNS, use_container_width=True, hide_index=True)
 
 st.markdown("📰 **Data sources:** CoinDesk & CoinGecko | Built with ❤️ using Streamlit")
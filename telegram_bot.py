@@ -1,26 +1,34 @@
 import os
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict
+from cachetools import TLRUCache
 from dotenv import load_dotenv
-from telegram import Update
+from telegram import Message, Update
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
 import httpx
 
+try:
+    import orjson
+except ImportError:  # stdlib json.loads also accepts bytes
+    import json as orjson
+
 # ===============================
 # 🔹 Logging setup
 # ===============================
+load_dotenv()  # first, so a LOG_LEVEL set in .env applies
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+    level=os.getenv("LOG_LEVEL", "INFO").upper()  # e.g. WARNING in production
 )
+# httpx logs every request at INFO; _request already logs them at DEBUG
+logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 # ===============================
 # 🔹 Environment setup
 # ===============================
-load_dotenv()
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 API_URL = "https://web3newbot.onrender.com"
 
@@ -28,193 +36,318 @@ if not BOT_TOKEN:
     raise ValueError("🚨 TELEGRAM_BOT_TOKEN not found in .env file!")
 
 # ===============================
-# 🔹 Simple cache (optional)
+# 🔹 Response cache
 # ===============================
-class SimpleCache:
-    def __init__(self, ttl_seconds: int = 300):
-        self.cache: Dict[str, tuple[Any, datetime]] = {}
-        self.ttl = timedelta(seconds=ttl_seconds)
-
-    def get(self, key: str) -> Optional[Any]:
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if datetime.now() - timestamp < self.ttl:
-                return data
-            del self.cache[key]
-        return None
-
-    def set(self, key: str, value: Any):
-        self.cache[key] = (value, datetime.now())
-
-cache = SimpleCache(ttl_seconds=300)
+# Per-endpoint (data, fetched_at, ttl) backend responses. Handlers run on
+# one event loop and never await between a cache check and write, so no
+# lock is needed. Past half its TTL an entry is served stale while it
+# refreshes.
+CACHE_TTL = 300  # seconds, until an endpoint's request rate is known
+MIN_CACHE_TTL = 30
+MAX_CACHE_TTL = 600
+GAP_ALPHA = 0.2  # EWMA weight of the newest gap between requests
+NEGATIVE_TTL = 30  # seconds a failed endpoint answers None without retrying
+
+cache: TLRUCache = TLRUCache(maxsize=16, ttu=lambda _key, entry, now: now + entry[2])
+_inflight: Dict[str, asyncio.Task] = {}
+_last_seen: Dict[str, float] = {}
+_gap_ewma: Dict[str, float] = {}
+
+
+def _observe(endpoint: str) -> None:
+    """Fold the time since the previous request for endpoint into its EWMA."""
+    now = time.monotonic()
+    last = _last_seen.get(endpoint)
+    _last_seen[endpoint] = now
+    if last is not None:
+        gap = now - last
+        ewma = _gap_ewma.get(endpoint)
+        _gap_ewma[endpoint] = gap if ewma is None else ewma + GAP_ALPHA * (gap - ewma)
+
+
+def ttl_for(endpoint: str) -> float:
+    """Half the typical gap between requests, clipped to MIN/MAX_CACHE_TTL."""
+    ewma = _gap_ewma.get(endpoint)
+    if ewma is None:
+        return CACHE_TTL
+    return min(max(0.5 * ewma, MIN_CACHE_TTL), MAX_CACHE_TTL)
 
 # ===============================
 # 🔹 HTTP Client
 # ===============================
-http_client = httpx.AsyncClient(timeout=30.0)
+# Separate stage budgets: a slow connect no longer eats the whole read
+# window, and a saturated pool fails fast instead of queueing for 30s.
+HTTP_TIMEOUT = httpx.Timeout(connect=5.0, read=20.0, write=5.0, pool=2.0)
+
+# Render's nginx keeps idle connections for 75s; httpx drops them after 5s
+# by default, which would cost a fresh TLS handshake on most commands.
+# HTTP/2 also lets market()'s two requests share one TLS connection as streams.
+http_client = httpx.AsyncClient(
+    http2=True,
+    follow_redirects=True,
+    timeout=HTTP_TIMEOUT,
+    limits=httpx.Limits(max_keepalive_connections=5, max_connections=10, keepalive_expiry=30.0),
+)
 
 
-async def fetch_data(endpoint: str) -> Optional[Dict]:
+async def _request(endpoint: str) -> Optional[Dict]:
     url = f"{API_URL}/{endpoint}"
     try:
-        logger.info(f"Fetching data from {url}")
-        response = await http_client.get(url)
+        logger.debug("Fetching data from %s", url)
+        try:
+            response = await http_client.get(url)
+        except httpx.PoolTimeout:
+            # Only the local pool was busy; the backend itself is fine
+            response = await http_client.get(url)
         response.raise_for_status()
-        return response.json()
+        data = orjson.loads(response.content)
     except Exception as e:
-        logger.error(f"Error fetching {url}: {e}")
+        logger.error("Error fetching %s: %s", url, e)
+        # Negative entry, unless a good (stale) response is still cached
+        entry = cache.get(endpoint)
+        if entry is None or entry[0] is None:
+            cache[endpoint] = (None, time.monotonic(), NEGATIVE_TTL)
         return None
+    cache[endpoint] = (data, time.monotonic(), ttl_for(endpoint))
+    return data
+
+
+def _start_request(endpoint: str) -> asyncio.Task:
+    """Start a backend request unless one for endpoint is already running."""
+    task = _inflight.get(endpoint)
+    if task is None:
+        task = asyncio.create_task(_request(endpoint))
+        _inflight[endpoint] = task
+        task.add_done_callback(lambda _: _inflight.pop(endpoint, None))
+    return task
+
+
+def is_cached(endpoint: str) -> bool:
+    """True when fetch_data(endpoint) will answer without waiting on the backend."""
+    return endpoint in cache
+
+
+async def fetch_data(endpoint: str) -> Optional[Dict]:
+    """Cached backend response; only blocks when nothing is cached yet."""
+    _observe(endpoint)
+    entry = cache.get(endpoint)
+    if entry is not None:
+        data, fetched_at, ttl = entry
+        if data is not None and time.monotonic() - fetched_at > ttl / 2:
+            _start_request(endpoint)
+        return data
+
+    # Shield so one cancelled handler does not cancel the request for the rest
+    return await asyncio.shield(_start_request(endpoint))
 
 # ===============================
 # 🔹 Telegram Commands
 # ===============================
+_ts_cache = [0, ""]
+
+
+def now_hms() -> str:
+    """Local HH:MM:SS for reply footers, formatted at most once per second."""
+    second = int(time.time())
+    if second != _ts_cache[0]:
+        _ts_cache[0] = second
+        _ts_cache[1] = time.strftime("%H:%M:%S", time.localtime(second))
+    return _ts_cache[1]
+
+
+async def acknowledge(update: Update, text: str, *endpoints: str) -> Optional[Message]:
+    """Send a placeholder only when an endpoint has to wait on the backend."""
+    if all(is_cached(endpoint) for endpoint in endpoints):
+        return None
+    return await update.message.reply_text(text)
+
+
+async def respond(update: Update, ack: Optional[Message], text: str, **kwargs):
+    """Turn the placeholder into the answer, or reply directly on a cache hit."""
+    if ack is not None:
+        await ack.edit_text(text, **kwargs)
+    else:
+        await update.message.reply_text(text, **kwargs)
+
+
+# Keys are lowercased; the backend labels headlines "🟢 Bullish" etc.
+_SENTIMENT_EMOJI = {
+    "positive": "🟢",
+    "negative": "🔴",
+    "neutral": "⚪",
+    # Labels as the backend's classify_sentiment emits them, lowercased
+    "🟢 bullish": "🟢",
+    "🔴 bearish": "🔴",
+    "⚪ neutral": "⚪",
+}
+_UNKNOWN_EMOJI = "⚪"
+
+WELCOME_MSG = (
+    "👋 *Welcome to the Web3 Crypto Bot!*\n\n"
+    "Available commands:\n"
+    "• /news - Latest CoinDesk news (20 headlines)\n"
+    "• /gainers - Top 20 gainers (24h)\n"
+    "• /losers - Top 20 losers (24h)\n"
+    "• /market - Combined 24h overview\n"
+    "• /help - Show this message\n\n"
+    "_Data is fetched live on demand._"
+)
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    msg = (
-        "👋 *Welcome to the Web3 Crypto Bot!*\n\n"
-        "Available commands:\n"
-        "• /news - Latest CoinDesk news (20 headlines)\n"
-        "• /gainers - Top 20 gainers (24h)\n"
-        "• /losers - Top 20 losers (24h)\n"
-        "• /market - Combined 24h overview\n"
-        "• /help - Show this message\n\n"
-        "_Data is fetched live on demand._"
-    )
-    await update.message.reply_text(msg, parse_mode="Markdown")
+    await update.message.reply_text(WELCOME_MSG, parse_mode="Markdown")
 
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await start(update, context)
+    await update.message.reply_text(WELCOME_MSG, parse_mode="Markdown")
 
 # ================================
-# NEWS – FIXED TO SHOW TOP 20
+# MESSAGE FORMATTING
 # ================================
-async def news(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("🔄 Fetching latest news...")
-    data = await fetch_data("coindesk")
+# Formatted bodies are reused until fetch_data returns a new payload object,
+# so each backend response is rendered once per type rather than per reader.
+_formatted: Dict[str, tuple] = {}
 
-    if not data or not data.get("articles"):
-        await update.message.reply_text("⚠️ No news available right now.")
-        return
 
-    message = "📰 *Latest CoinDesk News*\n\n"
+def formatted(data: Dict, formatter) -> str:
+    """formatter(data), cached against the identity of data."""
+    hit = _formatted.get(formatter.__name__)
+    if hit is not None and hit[0] is data:
+        return hit[1]
+    text = formatter(data)
+    _formatted[formatter.__name__] = (data, text)
+    return text
+
+
+def format_news(data: Dict) -> str:
+    parts = ["📰 *Latest CoinDesk News*\n\n"]
     for i, article in enumerate(data["articles"][:20], 1):
         title = article.get("title", "No title")
         link = article.get("link", "")
         sentiment = article.get("sentiment", "neutral").lower()
+        emoji = _SENTIMENT_EMOJI.get(sentiment, _UNKNOWN_EMOJI)
 
-        emoji = {
-            "positive": "🟢",
-            "negative": "🔴",
-            "neutral": "⚪"
-        }.get(sentiment, "⚪")
-
-        message += f"{i}. [{title}]({link}) {emoji}\n\n"
+        parts.append(f"{i}. [{title}]({link}) {emoji}\n\n")
+    return "".join(parts)
 
-    message += f"_Updated: {datetime.now().strftime('%H:%M:%S')}_"
-    await update.message.reply_text(message, parse_mode="Markdown", disable_web_page_preview=True)
 
-# ================================
-# GAINERS – FIXED FIELDS
-# ================================
-async def gainers(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("🔄 Fetching top gainers...")
-    data = await fetch_data("gainers-losers")
-
-    if not data or not data.get("top_gainers"):
-        await update.message.reply_text("⚠️ No market data available.")
-        return
-
-    message = "📈 *Top 20 Gainers (24h)*\n\n"
-    for i, coin in enumerate(data["top_gainers"][:20], 1):
+def _format_movers(header: str, arrow: str, coins: list) -> str:
+    parts = [header]
+    for i, coin in enumerate(coins[:20], 1):
         name = coin.get("name")
         symbol = coin.get("symbol", "").upper()
         price = coin.get("usd", 0)
         change = coin.get("usd_24h_change", 0)
         volume = coin.get("usd_24h_vol", 0)
 
-        message += (
+        parts.append(
             f"{i}. *{name}* ({symbol})\n"
             f"   💰 Price: `${price:,.6f}`\n"
-            f"   📈 24h Change: `{change:.2f}%`\n"
+            f"   {arrow} 24h Change: `{change:.2f}%`\n"
             f"   🔊 Volume: `${volume:,.0f}`\n\n"
         )
+    return "".join(parts)
+
 
-    message += f"_Updated: {datetime.now().strftime('%H:%M:%S')}_"
-    await update.message.reply_text(message, parse_mode="Markdown")
+def format_gainers(data: Dict) -> str:
+    return _format_movers("📈 *Top 20 Gainers (24h)*\n\n", "📈", data["top_gainers"])
+
+
+def format_losers(data: Dict) -> str:
+    return _format_movers("📉 *Top 20 Losers (24h)*\n\n", "📉", data["top_losers"])
+
+
+def format_market_news(data: Dict) -> str:
+    parts = ["📰 *Top News:*\n"]
+    for i, article in enumerate(data["articles"][:3], 1):
+        title = article.get("title", "No title")
+        link = article.get("link", "")
+        parts.append(f"{i}. [{title[:60]}...]({link})\n")
+    parts.append("\n")
+    return "".join(parts)
+
+
+def format_market_movers(data: Dict) -> str:
+    parts = ["📈 *Top Gainers:*\n"]
+    for i, coin in enumerate(data.get("top_gainers", [])[:3], 1):
+        name = coin["name"]
+        symbol = coin["symbol"].upper()
+        change = coin["usd_24h_change"]
+        parts.append(f"{i}. {name} ({symbol}): +{change:.2f}%\n")
+
+    parts.append("\n📉 *Top Losers:*\n")
+    for i, coin in enumerate(data.get("top_losers", [])[:3], 1):
+        name = coin["name"]
+        symbol = coin["symbol"].upper()
+        change = coin["usd_24h_change"]
+        parts.append(f"{i}. {name} ({symbol}): {change:.2f}%\n")
+    return "".join(parts)
+
+# ================================
+# NEWS – FIXED TO SHOW TOP 20
+# ================================
+async def news(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    ack = await acknowledge(update, "🔄 Fetching latest news...", "coindesk")
+    data = await fetch_data("coindesk")
+
+    if not data or not data.get("articles"):
+        await respond(update, ack, "⚠️ No news available right now.")
+        return
+
+    message = f"{formatted(data, format_news)}_Updated: {now_hms()}_"
+    await respond(update, ack, message, parse_mode="Markdown", disable_web_page_preview=True)
+
+# ================================
+# GAINERS – FIXED FIELDS
+# ================================
+async def gainers(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    ack = await acknowledge(update, "🔄 Fetching top gainers...", "gainers-losers")
+    data = await fetch_data("gainers-losers")
+
+    if not data or not data.get("top_gainers"):
+        await respond(update, ack, "⚠️ No market data available.")
+        return
+
+    message = f"{formatted(data, format_gainers)}_Updated: {now_hms()}_"
+    await respond(update, ack, message, parse_mode="Markdown")
 
 # ================================
 # LOSERS – FIXED FIELDS
 # ================================
 async def losers(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("🔄 Fetching top losers...")
+    ack = await acknowledge(update, "🔄 Fetching top losers...", "gainers-losers")
     data = await fetch_data("gainers-losers")
 
     if not data or not data.get("top_losers"):
-        await update.message.reply_text("⚠️ No market data available.")
+        await respond(update, ack, "⚠️ No market data available.")
         return
 
-    message = "📉 *Top 20 Losers (24h)*\n\n"
-    for i, coin in enumerate(data["top_losers"][:20], 1):
-        name = coin.get("name")
-        symbol = coin.get("symbol", "").upper()
-        price = coin.get("usd", 0)
-        change = coin.get("usd_24h_change", 0)
-        volume = coin.get("usd_24h_vol", 0)
-
-        message += (
-            f"{i}. *{name}* ({symbol})\n"
-            f"   💰 Price: `${price:,.6f}`\n"
-            f"   📉 24h Change: `{change:.2f}%`\n"
-            f"   🔊 Volume: `${volume:,.0f}`\n\n"
-        )
-
-    message += f"_Updated: {datetime.now().strftime('%H:%M:%S')}_"
-    await update.message.reply_text(message, parse_mode="Markdown")
+    message = f"{formatted(data, format_losers)}_Updated: {now_hms()}_"
+    await respond(update, ack, message, parse_mode="Markdown")
 
 # ================================
 # MARKET OVERVIEW
 # ================================
 async def market(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("🔄 Fetching market update...")
+    ack = await acknowledge(update, "🔄 Fetching market update...", "coindesk", "gainers-losers")
 
-    news_data, market_data = await asyncio.gather(
-        fetch_data("coindesk"),
-        fetch_data("gainers-losers")
-    )
+    async with asyncio.TaskGroup() as tg:
+        news_task = tg.create_task(fetch_data("coindesk"))
+        market_task = tg.create_task(fetch_data("gainers-losers"))
+    news_data, market_data = news_task.result(), market_task.result()
 
     if not news_data and not market_data:
-        await update.message.reply_text("⚠️ Unable to fetch data.")
+        await respond(update, ack, "⚠️ Unable to fetch data.")
         return
 
-    message = "🌐 *Market Overview (24h)*\n\n"
-
-    # Top news
+    parts = ["🌐 *Market Overview (24h)*\n\n"]
     if news_data and news_data.get("articles"):
-        message += "📰 *Top News:*\n"
-        for i, article in enumerate(news_data["articles"][:3], 1):
-            title = article.get("title", "No title")
-            link = article.get("link", "")
-            message += f"{i}. [{title[:60]}...]({link})\n"
-        message += "\n"
-
-    # Top gainers
+        parts.append(formatted(news_data, format_market_news))
     if market_data:
-        message += "📈 *Top Gainers:*\n"
-        for i, coin in enumerate(market_data.get("top_gainers", [])[:3], 1):
-            name = coin["name"]
-            symbol = coin["symbol"].upper()
-            change = coin["usd_24h_change"]
-            message += f"{i}. {name} ({symbol}): +{change:.2f}%\n"
-
-        message += "\n📉 *Top Losers:*\n"
-        for i, coin in enumerate(market_data.get("top_losers", [])[:3], 1):
-            name = coin["name"]
-            symbol = coin["symbol"].upper()
-            change = coin["usd_24h_change"]
-            message += f"{i}. {name} ({symbol}): {change:.2f}%\n"
-
-    message += f"\n_Updated: {datetime.now().strftime('%H:%M:%S')}_"
-    await update.message.reply_text(message, parse_mode="Markdown", disable_web_page_preview=True)
+        parts.append(formatted(market_data, format_market_movers))
+
+    parts.append(f"\n_Updated: {now_hms()}_")
+    await respond(update, ack, "".join(parts), parse_mode="Markdown", disable_web_page_preview=True)
 
 # ===============================
 # 🚀 Main entry